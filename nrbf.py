@@ -25,45 +25,65 @@
 # (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-__all__ = ['read_stream', 'serialization', 'JSONEncoder']
+__all__ = ['read_stream', 'read_streams', 'serialization', 'JSONEncoder']
 
 import enum, itertools, json, re, sys
 from array       import array as Array, typecodes
 from collections import OrderedDict, namedtuple
-from copy        import deepcopy
 from datetime    import datetime, timedelta, timezone
 from decimal     import Decimal
 from keyword     import iskeyword
+from mmap        import mmap
 from struct      import Struct, pack
-from contextlib  import suppress
+from contextlib  import contextmanager, suppress
 from namedlist   import namedlist
 
 
-# Decorator which adds an enum value (an int or a length-one bytes) and its associated
-# reader function to a registration dict (either PrimitiveType_readers or RecordType_readers)
-def _register_reader(type_dict, enum_value):
-    if isinstance(enum_value, int):
-        enum_value = bytes([enum_value])  # convert from int to length-one bytes
-    else:
-        assert isinstance(enum_value, bytes) and len(enum_value) == 1
+# Decorator which adds an enum value (an int) and its associated reader function
+# to a registration list (either PrimitiveType_readers or RecordType_readers)
+def _register_reader(type_list, enum_value):
+    assert isinstance(enum_value, int)
     def decorator(read_func):
-        type_dict[enum_value] = read_func
+        type_list[enum_value] = read_func
         return read_func
     return decorator
 
 
 class serialization:
+    # If overwrite info is never needed, creates a _read_only_serialization (defined below) instead,
+    # which skips checking for it (a class is used rather than binding _read_Record_or_Primitive_fast
+    # to the instance in __init__(), which would create a reference cycle and delay freeing _buf)
+    def __new__(cls, streamfile, can_overwrite_member = False):
+        if not can_overwrite_member and cls is serialization:
+            cls = _read_only_serialization
+        return super().__new__(cls)
+
     def __init__(self, streamfile, can_overwrite_member = False):
         '''
-        :param streamfile: a file-like object in .NET Remoting Binary Format
-        :param can_overwrite_member: iff True, overwrite_member() may be called
+        :param streamfile: a file-like object in .NET Remoting Binary Format (read_header() reads just
+            the header, and read_stream() then reads the rest of the file into memory), or a bytes,
+            bytearray, or mmap object (it's parsed in place, so it mustn't be modified)
+        :param can_overwrite_member: iff True, overwrite_member() may be called (requires a file-like object)
         '''
-        assert streamfile.readable()
-        if can_overwrite_member:
-            assert streamfile.writable()
-            assert streamfile.seekable()
-        self._file               = streamfile
-        self._Class_by_id        = {}    # see _read_ClassInfo()
+        # The rest of the streamfile is read into memory all at once (unless it's already in memory), and
+        # the readers below then parse it from self._buf by advancing the self._pos cursor past each value read
+        if isinstance(streamfile, (bytes, bytearray, mmap)):
+            assert not can_overwrite_member
+            self._file           = None
+            self._base_pos       = 0
+            self._buf            = streamfile
+            self._rest_unread    = False
+        else:
+            assert streamfile.readable()
+            if can_overwrite_member:
+                assert streamfile.writable()
+                assert streamfile.seekable()
+            self._file           = streamfile
+            self._base_pos       = streamfile.tell() if streamfile.seekable() else 0
+            self._buf            = b''   # see read_header() and _read_rest()
+            self._rest_unread    = True
+        self._pos                = 0     # the cursor; the file position is _base_pos + _pos
+        self._ClassInfo_by_id    = {}    # see _read_ClassInfo()
         self._objects_by_id      = {}    # all referenceable objects indexed by ObjectId
         self._root_id            = None  # the id of the single root object
         self._member_references  = []    # all seen NRBF MemberReferences, see _read_MemberReference()
@@ -72,9 +92,38 @@ class serialization:
         # If can_overwrite_member is True, the below is a dict indexed by an object's python id();
         # each value contains multiple _OverwriteInfo objects, and has the same layout as the object
         self._overwrite_infos_by_pyid = {} if can_overwrite_member else None
+        self._pending_writes          = None  # a list of (pos, bytes) inside of overwrite_batch()
 
     _CollectionInfo = namedtuple('_CollectionInfo', 'obj id')      # original collection object and ObjectId
-    _OverwriteInfo  = namedtuple('_OverwriteInfo',  'pos format')  # file.tell() and struct format string
+    _OverwriteInfo  = namedtuple('_OverwriteInfo',  'pos format')  # file position and struct format string
+
+    # A read-only sequence of the _OverwriteInfo objects for an array of consecutive elements which
+    # share one format; instead of storing one _OverwriteInfo per element, it stores a range of their
+    # positions and creates each _OverwriteInfo only when it's retrieved (slices are also supported)
+    class _ArrayOverwriteInfos:
+        __slots__ = 'positions', 'format'
+        def __init__(self, positions, format):
+            self.positions = positions  # a range
+            self.format    = format
+        def __len__(self):
+            return len(self.positions)
+        def __getitem__(self, index):
+            if isinstance(index, slice):
+                return serialization._ArrayOverwriteInfos(self.positions[index], self.format)
+            return serialization._OverwriteInfo(self.positions[index], self.format)
+
+    # Reads the rest of the streamfile into memory, replacing the part of the buffer already parsed
+    def _read_rest(self):
+        self._base_pos   += self._pos
+        self._buf         = self._buf[self._pos:] + self._file.read()
+        self._pos         = 0
+        self._rest_unread = False
+
+    # Returns the next length bytes from the buffer and advances the cursor past them
+    def _read_raw(self, length):
+        pos = self._pos
+        self._pos = pos + length
+        return self._buf[pos : pos + length]
 
     # Below are a set of "readers" and other support types, one per defined structure in
     # revisions 10.0-12.0 of the ".NET Remoting: Binary Format Data Structure" specification
@@ -84,54 +133,106 @@ class serialization:
     # returning the closest Python analogous type to the .NET Primitive Type read.
     ######## Reference: https://docs.microsoft.com/en-us/openspecs/windows_protocols/ms-nrbf ########
 
-    # A dict of all PrimitiveType readers indexed by a length-one PrimitiveTypeEnumeration bytes object
-    _PrimitiveType_readers = {}
+    # A list of all PrimitiveType readers indexed by a PrimitiveTypeEnumeration int; like
+    # _RecordType_readers further below, every possible byte value has an entry
+    def _read_unknown_PrimitiveType(self):
+        raise ValueError('unknown PrimitiveType')
+    _PrimitiveType_readers = [_read_unknown_PrimitiveType] * 256
+    #
+    # Called when a PrimitiveType reader raises a ValueError; if primitive_type is unknown, replaces it
+    # with one which includes primitive_type (it's not always the byte just before the value, so the
+    # reader above can't report it), otherwise just returns so the caller can re-raise the original
+    def _check_PrimitiveType(self, primitive_type):
+        if self._PrimitiveType_readers[primitive_type] is serialization._read_unknown_PrimitiveType:
+            raise ValueError(f'unknown PrimitiveType {primitive_type}') from None
+
+    # The length of a UTF-8 sequence indexed by its first byte (invalid first bytes
+    # are given some length anyways, and then fail to decode in _read_Char() below)
+    _utf8_length_by_first_byte = bytes([1] * 0b_1100_0000 +  # 0xxxxxxx (and 10xxxxxx which is invalid)
+                                       [2] * 0b_0010_0000 +  # 110xxxxx
+                                       [3] * 0b_0001_0000 +  # 1110xxxx
+                                       [4] * 0b_0001_0000)   # 11110xxx (and 11111xxx which is invalid)
 
     @_register_reader(_PrimitiveType_readers, 3)
     def _read_Char(self):
-        first_byte = self._file.read(1)
-        if   first_byte[0] < 0b_1100_0000:
-            return first_byte.decode('utf-8')
-        elif first_byte[0] < 0b_1110_0000:
-            more_bytes = 1
-        elif first_byte[0] < 0b_1111_0000:
-            more_bytes = 2
-        else:
-            more_bytes = 3
-        return (first_byte + self._file.read(more_bytes)).decode('utf-8')
+        pos = self._pos
+        end = pos + self._utf8_length_by_first_byte[self._buf[pos]]
+        self._pos = end
+        return self._buf[pos:end].decode()  # (UTF-8 is the default, and the fastest way to specify it)
 
     @_register_reader(_PrimitiveType_readers, 12)
     def _read_TimeSpan(self):
-        return timedelta(microseconds= self._read_Int64() / 10)  # units of 100 nanoseconds
+        return self._timedelta_from_ticks(self._read_Int64())
+
+    @staticmethod
+    def _timedelta_from_ticks(ticks):
+        # Integer-divided like _datetime_from_ticks() (to preserve their precision), and truncated
+        # towards zero like .NET does (ticks can be negative, which would otherwise round down)
+        microseconds = ticks // 10 if ticks >= 0 else -(-ticks // 10)
+        return timedelta(microseconds=microseconds)  # units of 100 nanoseconds
 
     @_register_reader(_PrimitiveType_readers, 13)
     def _read_DateTime(self):
-        ticks = self._read_UInt64()
+        return self._datetime_from_ticks(self._read_UInt64())
+
+    @staticmethod
+    def _datetime_from_ticks(ticks):
         kind  = ticks >> 62     # the 2 most significant bits store the "kind"
         ticks &= (1 << 62) - 1  # all but the above
         if ticks >= 1 << 61:    # if negative, reinterpret
             ticks -= 1 << 62    # as 62-bit two's complement
+        # Positive ticks always fit (62 bits of them is less than datetime.max), negative ones never do;
+        # they're integer-divided to preserve their precision (a float can't exactly represent most)
         time = datetime(1, 1, 1)
-        with suppress(OverflowError):
-            time += timedelta(microseconds= ticks / 10)
+        if ticks > 0:
+            time += timedelta(microseconds= ticks // 10)  # units of 100 nanoseconds
         if kind == 1:
             time = time.replace(tzinfo=timezone.utc)
         elif kind == 2:
-            with suppress(OSError):
+            try:
                 time = time.astimezone()  # kind 2 is the local time zone
+            except OSError:
+                pass
         return time
 
     @_register_reader(_PrimitiveType_readers, 18)
     def _read_LengthPrefixedString(self):
-        length = 0
-        for bit_range in range(0, 5*7, 7):  # each bit range is 7 bits long, with at most 5 of them
-            byte    = self._read_Byte()
-            length += (byte & ((1 << 7) - 1)) << bit_range  # highest bit masked out, then shifted
-            if byte & (1 << 7) == 0:        # the "is there more?" (highest/most significant) bit
-                break
+        # The length is stored in 7-bit ranges, with at most 5 of them; the highest bit of
+        # each byte is the "is there more?" bit. Nearly all lengths fit in just the first
+        # byte, so that case is handled first on its own; the rest are unrolled below it.
+        buf    = self._buf
+        pos    = self._pos
+        length = buf[pos]
+        if length < 0x80:
+            end = pos + 1 + length
+            self._pos = end
+            return buf[pos + 1 : end].decode()  # UTF-8 (see _read_Char above)
+        low7    = (1 << 7) - 1  # all but the "is there more?" bit
+        length &= low7
+        byte    = buf[pos + 1]
+        length |= (byte & low7) << 7
+        if byte < 0x80:
+            pos += 2
         else:
-            raise OverflowError('LengthPrefixedString overflow')
-        return self._file.read(length).decode('utf-8')
+            byte    = buf[pos + 2]
+            length |= (byte & low7) << 14
+            if byte < 0x80:
+                pos += 3
+            else:
+                byte    = buf[pos + 3]
+                length |= (byte & low7) << 21
+                if byte < 0x80:
+                    pos += 4
+                else:
+                    byte    = buf[pos + 4]
+                    length |= (byte & low7) << 28
+                    if byte < 0x80:
+                        pos += 5
+                    else:
+                        raise OverflowError('LengthPrefixedString overflow')
+        end = pos + length
+        self._pos = end
+        return buf[pos:end].decode()
 
     @_register_reader(_PrimitiveType_readers, 5)
     def _read_Decimal(self):
@@ -141,11 +242,21 @@ class serialization:
     def _read_Null(self):
         return None
 
+    # Bytes are read far more often than any other type (they're in every record header), and
+    # indexing bytes already returns an int, so this needn't be created with struct.unpack below
+    @_register_reader(_PrimitiveType_readers, 2)
+    def _read_Byte(self):
+        pos = self._pos
+        self._pos = pos + 1
+        return self._buf[pos]
+
     # Creates the rest of the PrimitiveType readers (those based on struct.unpack),
-    # and also initializes the two class variables (both dicts) below;
+    # and also initializes the class variables (all dicts) below;
     # this only works when it's called after the class has been fully defined.
-    _array_format_by_primitive_type  = {}  # array-format-specs  indexed by PrimitiveTypeEnumeration length-one bytes
-    _struct_format_by_primitive_type = {}  # struct-format-specs indexed by PrimitiveTypeEnumeration length-one bytes
+    _array_format_by_primitive_type  = {}  # array-format-specs  indexed by PrimitiveTypeEnumeration ints
+    _struct_format_by_primitive_type = {}  # struct-format-specs indexed by PrimitiveTypeEnumeration ints
+    _struct_size_by_format           = {}  # the size in bytes of each of the struct-format-specs above
+    _Array_elements_readers          = {}  # see _read_Array_elements(), also indexed by PrimitiveTypeEnumeration ints
     @classmethod
     def _create_PrimitiveType_readers(cls):
         array_typesizes = {t : Array(t).itemsize  for t in typecodes}
@@ -161,11 +272,15 @@ class serialization:
                 (14, '_read_UInt16',  '<H', False),
                 (15, '_read_UInt32',  '<I', False),
                 (16, '_read_UInt64',  '<Q', False)):
-            enum_value = bytes([enum_value])  # convert from int to length-one bytes
             struct = Struct(format)
-            reader = lambda self, s=struct: s.unpack(self._file.read(s.size))[0]
-            setattr(cls, name, _register_reader(cls._PrimitiveType_readers, enum_value)(reader))
+            if name not in cls.__dict__:  # (unless it was already defined above)
+                def reader(self, unpack_from=struct.unpack_from, size=struct.size):
+                    pos = self._pos
+                    self._pos = pos + size
+                    return unpack_from(self._buf, pos)[0]
+                setattr(cls, name, _register_reader(cls._PrimitiveType_readers, enum_value)(reader))
             cls._struct_format_by_primitive_type[enum_value] = format
+            cls._struct_size_by_format[format] = struct.size
             array_formats = ''
             if signed is not None:
                 array_formats = 'bhilq' if signed else 'BHILQ'  # all integer array formats of one signedness
@@ -174,6 +289,23 @@ class serialization:
             with suppress(StopIteration):
                 cls._array_format_by_primitive_type[enum_value] = next(f          # the first array-format (f), if any,
                     for f in array_formats if array_typesizes[f] == struct.size)  # whose size matches the struct-format's
+                cls._Array_elements_readers[enum_value] = cls._read_Array_native_elements
+
+    # Reads count consecutive Int32s with one unpack_from() call, and returns them in a tuple
+    _Int32s_struct_by_count = {}
+    def _read_Int32s(self, count):
+        struct = self._Int32s_struct_by_count.get(count)
+        if not struct:
+            struct = self._Int32s_struct_by_count[count] = Struct(f'<{count}i')
+        pos = self._pos
+        self._pos = pos + struct.size
+        return struct.unpack_from(self._buf, pos)
+    #
+    # The same as _read_Int32s(2), the most common count, but without the lookup
+    def _read_Int32_pair(self, unpack_from=Struct('<2i').unpack_from):
+        pos = self._pos
+        self._pos = pos + 8
+        return unpack_from(self._buf, pos)
 
     # The ClassTypeInfo structure is read and ignored
     def _read_ClassTypeInfo(self):
@@ -202,7 +334,7 @@ class serialization:
     #     GenericMethod          = 0x00008000
 
     # def _read_ValueWithCode(self):
-    #     return self._PrimitiveType_readers[self._file.read(1)](self)
+    #     return self._PrimitiveType_readers[self._read_Byte()](self)
 
     # _read_StringValueWithCode = _read_ValueWithCode
 
@@ -210,8 +342,11 @@ class serialization:
     #     return [self._read_ValueWithCode() for i in range(self._read_Int32())]
 
 
-    # A dict of all RecordType readers indexed by a length-one RecordTypeEnumeration bytes object
-    _RecordType_readers = {}
+    # A list of all RecordType readers indexed by a RecordTypeEnumeration int; every possible
+    # byte value has an entry, so that the readers can be indexed without first checking the byte
+    def _read_unknown_RecordType(self):
+        raise ValueError(f'unknown RecordType {self._buf[self._pos - 1]}')
+    _RecordType_readers = [_read_unknown_RecordType] * 256
 
     @_register_reader(_RecordType_readers, 21)
     def _read_BinaryMethodCall(self):
@@ -238,71 +373,182 @@ class serialization:
 
     ######## Classes ########
 
-    # Reads a ClassInfo structure, creates a new Python class with the members specified by the
-    # ClassInfo, adds it to self._Class_by_id indexed by the ObjectId, and returns the class and id.
+    # The Python classes created by _read_ClassInfo(), indexed by their .NET class name and (unsanitized)
+    # member names; these are shared by all streams, so a class is only created once per process
+    _Class_cache = {}
+
+    # Everything required to read the members of each instance of a Class, as specified by one
+    # ClassInfo and its MemberTypeInfo (if any); it's kept separately from the Class, because the
+    # same Class is shared by every ClassInfo with the same class and member names
+    class _ClassInfo:
+        __slots__ = 'Class', 'primitive_types', 'members_formats', 'members_struct', 'members_plan'
+        def __init__(self, Class):
+            self.Class           = Class
+            member_count         = len(Class._fields)
+            # Per-member lists indexed by member number, filled in by _read_MemberTypeInfo() if present:
+            self.primitive_types = [None] * member_count  # PrimitiveTypeEnumerations (or None if not a primitive)
+            self.members_formats = None                   # struct-format-specs, only if *all* members have one
+            self.members_struct  = None                   # the combination of the members_formats above
+            self.members_plan    = [(m, m + 1, None) for m in range(member_count)]  # see _read_Class_members()
+
+    # Reads a ClassInfo structure, finds or creates a Python class with the members specified by the
+    # ClassInfo, adds a _ClassInfo to self._ClassInfo_by_id indexed by the ObjectId, and returns it and the id.
     def _read_ClassInfo(self):
         object_id    = self._read_Int32()
         class_name   = self._read_LengthPrefixedString()
         member_count = self._read_Int32()
         member_names = [self._read_LengthPrefixedString() for i in range(member_count)]
-        unique_members = set()
-        for member_num, member_name in enumerate(member_names):
-            member_name = make_unique(sanitize_identifier(member_name), unique_members)
-            unique_members.add(member_name)
-            member_names[member_num] = member_name
-        Class = namedlist(sanitize_identifier(class_name), member_names, default=None)
-        Class._primitive_types = {}  # filled in below by _read_MemberTypeInfo()
-        # Check to see if there is a converter method which can convert this type from a .NET
-        # Collection (e.g. an ArrayList or Generic.List) to a native python type, and store it.
-        if class_name.startswith('System.Collections.'):
-            short_name = class_name[19:].split('`', 1)[0]  # strip 'System.Collections.' and any type params after backtick
-            short_name = short_name.replace('.', '_').lower()  # e.g. 'arraylist' or 'generic_list'
-            converter = getattr(self, f'_convert_{short_name}', None)
-            if callable(converter):
-                Class._convert_collection = converter
-        self._Class_by_id[object_id] = Class
-        return Class, object_id
+        cache_key = class_name, tuple(member_names)
+        Class = self._Class_cache.get(cache_key)
+        if not Class:
+            # The member names are only sanitized (and made unique) when a new Class is created
+            unique_members = set()
+            next_suffixes  = {}
+            for member_num, member_name in enumerate(member_names):
+                member_name = make_unique(sanitize_identifier(member_name), unique_members, next_suffixes)
+                unique_members.add(member_name)
+                member_names[member_num] = member_name
+            Class = namedlist(sanitize_identifier(class_name), member_names, default=None)
+            # Check to see if there is a converter method which can convert this type from a .NET
+            # Collection (e.g. an ArrayList or Generic.List) to a native python type, and store its name
+            # (not the bound method itself, since the Class outlives this serialization instance).
+            if class_name.startswith('System.Collections.'):
+                short_name = class_name[19:].split('`', 1)[0]  # strip 'System.Collections.' and any type params after backtick
+                short_name = short_name.replace('.', '_').lower()  # e.g. 'arraylist' or 'generic_list'
+                converter_name = f'_convert_{short_name}'
+                if callable(getattr(self, converter_name, None)):
+                    Class._convert_collection = converter_name
+            self._Class_cache[cache_key] = Class
+        class_info = self._ClassInfo(Class)
+        self._ClassInfo_by_id[object_id] = class_info
+        return class_info, object_id
+
+    # Returns a new instance of a Class created by _read_ClassInfo() with the member values in order;
+    # this skips namedlist's generic __init__ (which checks each value for a factory), and is
+    # about three times faster, which matters since there's usually one instance per class record
+    @staticmethod
+    def _new_instance(Class, values, new=object.__new__):
+        obj = new(Class)
+        for member_name, value in zip(Class._fields, values):
+            setattr(obj, member_name, value)
+        return obj
 
     # Readers for the AdditionalInfos member of MemberTypeInfo indexed by
     # BinaryTypeEnumeration ints; created after this class is fully defined
     _AdditionalInfo_readers = ()
 
-    def _read_MemberTypeInfo(self, Class):
-        binary_types = [self._read_Byte() for m in Class._fields]  # BinaryTypeEnums
-        for member_num, binary_type in enumerate(binary_types):    # AdditionalInfos
+    def _read_MemberTypeInfo(self, class_info):
+        binary_types    = [self._read_Byte() for m in class_info.Class._fields]  # BinaryTypeEnums
+        primitive_types = class_info.primitive_types
+        for member_num, binary_type in enumerate(binary_types):                  # AdditionalInfos
             additional_info = self._AdditionalInfo_readers[binary_type](self)
             if binary_type == 0:  # (0 == BinaryTypeEnumeration.Primitive)
-                Class._primitive_types[member_num] = additional_info  # save any PrimitiveType for later
+                primitive_types[member_num] = additional_info  # save any PrimitiveType for later
+        # If every member is a fixed-width primitive, combine their struct formats so that
+        # all of the members of each instance can be read with just one unpack_from() call
+        formats = [self._struct_format_by_primitive_type.get(t) for t in primitive_types]
+        if formats and all(formats):
+            class_info.members_struct  = Struct('<' + ''.join(f[1:] for f in formats))
+            class_info.members_formats = formats
+            return
+        # Otherwise, plan to read each run of consecutive fixed-width primitives with one unpack_from()
+        # call, and all other members one at a time; each step is (first member, last member + 1, Struct
+        # or None if it's just one member to read individually) in the order the members are stored
+        plan = []
+        for member_num, format in enumerate(formats):
+            if format and plan and plan[-1][2]:  # if this extends the run of primitives in the last step
+                plan[-1][1:] = member_num + 1, plan[-1][2] + format[1:]
+            else:
+                plan.append([member_num, member_num + 1, format])
+        class_info.members_plan = [(start, stop, format and Struct(format)) for start, stop, format in plan]
+
+    # Reads the members of a new instance of a _ClassInfo's Class, either all at once if members_struct
+    # has been set, otherwise per its members_plan (or one at a time via _read_members_into()
+    # if overwrite info is required), and returns the new instance
+    def _read_Class_members(self, class_info, object_id):
+        members_struct = class_info.members_struct
+        if not members_struct:
+            if self._add_overwrite_info:
+                return self._read_members_into(class_info.Class(), object_id, class_info.primitive_types)
+            return self._read_Class_members_by_plan(class_info, object_id)
+        Class = class_info.Class
+        pos = self._pos
+        obj = self._new_instance(Class, members_struct.unpack_from(self._buf, pos))
+        self._pos = pos + members_struct.size
+        if self._add_overwrite_info:
+            pos += self._base_pos
+            overwrite_infos = []
+            for format in class_info.members_formats:
+                overwrite_infos.append(self._OverwriteInfo(pos, format))
+                pos += self._struct_size_by_format[format]
+            self._overwrite_infos_by_pyid[id(obj)] = self._new_instance(Class, overwrite_infos)
+        self._add_object(obj, object_id)
+        return obj
+
+    # Reads the members of a new instance per a _ClassInfo's members_plan (see _read_MemberTypeInfo());
+    # this is the same as _read_members_into() with no overwrite info, only faster for classes
+    def _read_Class_members_by_plan(self, class_info, object_id):
+        buf                      = self._buf
+        read_Record_or_Primitive = self._read_Record_or_Primitive
+        marker_types             = self._marker_types
+        MemberReference          = self._MemberReference
+        primitive_types          = class_info.primitive_types
+        values                   = [None] * len(primitive_types)
+        member_refs              = []
+        skip_until               = 0
+        for start, stop, struct in class_info.members_plan:
+            if start < skip_until:  # if skipped by an ObjectNullMultiple
+                continue
+            if struct:
+                pos = self._pos
+                self._pos = pos + struct.size
+                values[start:stop] = struct.unpack_from(buf, pos)
+                continue
+            val = read_Record_or_Primitive(primitive_types[start])
+            if type(val) in marker_types:  # (see _read_members_into())
+                if type(val) is self._BinaryLibrary:
+                    val = read_Record_or_Primitive(None)
+                if type(val) is self._ObjectNullMultiple:
+                    skip_until = start + val.count
+                    continue
+                if type(val) is MemberReference:
+                    val.index_in_parent = start
+                    member_refs.append(val)
+            values[start] = val
+        obj = self._new_instance(class_info.Class, values)
+        for member_ref in member_refs:
+            member_ref.parent = obj
+        self._add_object(obj, object_id)
+        return obj
 
     @_register_reader(_RecordType_readers, 5)
     def _read_ClassWithMembersAndTypes(self):
-        Class, object_id = self._read_ClassInfo()
-        self._read_MemberTypeInfo(Class)
+        class_info, object_id = self._read_ClassInfo()
+        self._read_MemberTypeInfo(class_info)
         self._read_Int32()  # LibraryId is ignored
-        return self._read_members_into(Class(), object_id, Class._primitive_types.get)
+        return self._read_Class_members(class_info, object_id)
 
     @_register_reader(_RecordType_readers, 3)
     def _read_ClassWithMembers(self):
-        Class, object_id = self._read_ClassInfo()
+        class_info, object_id = self._read_ClassInfo()
         self._read_Int32()  # LibraryId is ignored
-        return self._read_members_into(Class(), object_id, Class._primitive_types.get)
+        return self._read_Class_members(class_info, object_id)
 
     @_register_reader(_RecordType_readers, 4)
     def _read_SystemClassWithMembersAndTypes(self):
-        Class, object_id = self._read_ClassInfo()
-        self._read_MemberTypeInfo(Class)
-        return self._read_members_into(Class(), object_id, Class._primitive_types.get)
+        class_info, object_id = self._read_ClassInfo()
+        self._read_MemberTypeInfo(class_info)
+        return self._read_Class_members(class_info, object_id)
 
     @_register_reader(_RecordType_readers, 2)
     def _read_SystemClassWithMembers(self):
-        Class, object_id = self._read_ClassInfo()
-        return self._read_members_into(Class(), object_id, Class._primitive_types.get)
+        class_info, object_id = self._read_ClassInfo()
+        return self._read_Class_members(class_info, object_id)
 
     @_register_reader(_RecordType_readers, 1)
     def _read_ClassWithId(self):
-        object_id = self._read_Int32()
-        Class = self._Class_by_id[self._read_Int32()]  # MetadataId
-        return self._read_members_into(Class(), object_id, Class._primitive_types.get)
+        object_id, metadata_id = self._read_Int32_pair()
+        return self._read_Class_members(self._ClassInfo_by_id[metadata_id], object_id)
 
     # If primitive_type is not None, read the specified primitive_type with one of the
     # PrimitiveType_readers. Otherwise read the next RecordType in the streamfile with one
@@ -310,52 +556,93 @@ class serialization:
     # object to overwrite_infos[overwrite_index] for each value read that is an overwritable
     # primitive. Finally, returns the value read.
     def _read_Record_or_Primitive(self, primitive_type, overwrite_infos = None, overwrite_index = None):
-        if primitive_type:
+        if primitive_type is not None:  # (an invalid 0 is rejected by its reader)
             if overwrite_infos:
                 format = self._struct_format_by_primitive_type.get(primitive_type)
                 if format:
-                    overwrite_infos[overwrite_index] = self._OverwriteInfo(self._file.tell(), format)
-            return self._PrimitiveType_readers[primitive_type](self)
+                    overwrite_infos[overwrite_index] = self._OverwriteInfo(self._base_pos + self._pos, format)
+            try:
+                return self._PrimitiveType_readers[primitive_type](self)
+            except ValueError:
+                self._check_PrimitiveType(primitive_type)
+                raise
         else:
-            record_type = self._file.read(1)
-            # If overwrite_infos is not None and record_type == MemberPrimitiveTyped, parse it ourselves--
-            # read in the PrimitiveTypeEnum and call ourselves to finish parsing and add the _OverwriteInfo
-            if overwrite_infos and record_type == b'\x08':
-                return self._read_Record_or_Primitive(self._file.read(1), overwrite_infos, overwrite_index)
+            pos = self._pos
+            self._pos = pos + 1
+            record_type = self._buf[pos]  # an int
+            # If record_type == MemberPrimitiveTyped, parse it ourselves-- read in the PrimitiveTypeEnum
+            # and call ourselves to finish parsing (and add the _OverwriteInfo if overwrite_infos is not None)
+            if record_type == 8:
+                return self._read_Record_or_Primitive(self._read_Byte(), overwrite_infos, overwrite_index)
             return self._RecordType_readers[record_type](self)
 
-    # Represents an NRBF MemberReference, see _read_MemberReference()
-    _MemberReference = namedlist('_MemberReference', 'id parent index_in_parent resolved', default=None)
+    # The same as _read_Record_or_Primitive() without overwrite info support (overwrite_infos and
+    # overwrite_index are ignored); _read_only_serialization uses it in its place
+    def _read_Record_or_Primitive_fast(self, primitive_type, overwrite_infos = None, overwrite_index = None):
+        if primitive_type is not None:
+            try:
+                return self._PrimitiveType_readers[primitive_type](self)
+            except ValueError:
+                self._check_PrimitiveType(primitive_type)
+                raise
+        pos = self._pos
+        self._pos = pos + 1
+        record_type = self._buf[pos]  # an int
+        if record_type == 8:  # (see _read_Record_or_Primitive())
+            return self._read_Record_or_Primitive_fast(self._read_Byte())
+        return self._RecordType_readers[record_type](self)
+
+    # Represents an NRBF MemberReference, see _read_MemberReference(); there can be very many of
+    # these, so it's a minimal class with __slots__ instead of a namedlist (it's never returned)
+    class _MemberReference:
+        __slots__ = 'id', 'parent', 'index_in_parent'
+        __hash__  = None  # unhashable, so collections keyed by unresolved references aren't converted
+        def __init__(self, id):
+            self.id              = id
+            self.parent          = None
+            self.index_in_parent = None
 
     # Reads list elements or members into the 'obj' pre-allocated list or namedlist instance
-    def _read_members_into(self, obj, object_id, members_primitive_type):
-        assert callable(members_primitive_type)  # when called with the member_num, returns any respective primitive type
+    def _read_members_into(self, obj, object_id, members_primitive_types):
+        assert len(members_primitive_types) == len(obj)  # indexed by member_num, any respective primitive type
         if self._add_overwrite_info:
             # create the object which will store the _OverwriteInfo objects for each overwritable member in 'obj'
             overwrite_infos = [None] * len(obj) if isinstance(obj, list) else obj.__class__()
         else:
             overwrite_infos = None
+        # (these are looked up once for the loop below)
+        read_Record_or_Primitive = self._read_Record_or_Primitive
+        marker_types             = self._marker_types
+        BinaryLibrary            = self._BinaryLibrary
+        ObjectNullMultiple       = self._ObjectNullMultiple
+        MemberReference          = self._MemberReference
+        obj_len                  = len(obj)
         member_num = 0
-        while member_num < len(obj):
-            val = self._read_Record_or_Primitive(members_primitive_type(member_num), overwrite_infos, member_num)
-            if isinstance(val, self._BinaryLibrary):  # a BinaryLibrary can precede a non-primitive member; it's ignored
-                val = self._read_Record_or_Primitive(None, overwrite_infos, member_num)
-            if isinstance(val, self._ObjectNullMultiple):  # represents one or more empty members
-                member_num += val.count
-                continue
-            if isinstance(val, self._MemberReference):     # see _read_MemberReference()
-                val.parent          = obj
-                val.index_in_parent = member_num
+        while member_num < obj_len:
+            val = read_Record_or_Primitive(members_primitive_types[member_num], overwrite_infos, member_num)
+            if type(val) in marker_types:  # most values aren't any of the types below, skip them all at once
+                if type(val) is BinaryLibrary:  # a BinaryLibrary can precede a non-primitive member; it's ignored
+                    val = read_Record_or_Primitive(None, overwrite_infos, member_num)
+                if type(val) is ObjectNullMultiple:  # represents one or more empty members
+                    member_num += val.count
+                    continue
+                if type(val) is MemberReference:     # see _read_MemberReference()
+                    val.parent          = obj
+                    val.index_in_parent = member_num
             obj[member_num] = val
             member_num += 1
         if overwrite_infos and any(overwrite_infos):
             self._overwrite_infos_by_pyid[id(obj)] = overwrite_infos
-        # Convertible collections are added to _objects_by_id after their conversion in read_stream()
+        self._add_object(obj, object_id)
+        return obj
+
+    # Adds a newly read list or namedlist instance to _objects_by_id, except for convertible
+    # collections which are added to _objects_by_id after their conversion in read_stream()
+    def _add_object(self, obj, object_id):
         if hasattr(obj.__class__, '_convert_collection'):
             self._collection_infos.append(self._CollectionInfo(obj, object_id))
         else:
             self._objects_by_id[object_id] = obj
-        return obj
 
 
     ######## Arrays ########
@@ -374,8 +661,7 @@ class serialization:
             return self in (self.Rectangular, self.RectangularOffset)
 
     def _read_ArrayInfo(self):
-        return (self._read_Int32(),  # ObjectId
-                self._read_Int32())  # Length
+        return self._read_Int32_pair()  # ObjectId, Length
 
     # This might not be able to use _read_members_into() since BinaryArrays are much more complex than
     # other types, thus it has no choice but to reimplement much of what _read_members_into() does
@@ -384,44 +670,74 @@ class serialization:
         object_id  = self._read_Int32()
         array_type = self._BinaryArrayTypeEnumeration(self._read_Byte())
         rank       = self._read_Int32()
-        lengths    = [self._read_Int32() for i in range(rank)]
+        lengths    = list(self._read_Int32s(rank))
         if array_type.is_offset():
-            [self._read_Int32() for i in range(rank)]  # LowerBounds are not implemented; they're ignored
+            self._read_Int32s(rank)  # LowerBounds are not implemented; they're ignored
         binary_type     = self._read_Byte()
         additional_info = self._AdditionalInfo_readers[binary_type](self)
         primitive_type  = additional_info if binary_type == 0 else None  # (0 == BinaryTypeEnumeration.Primitive)
         # If the BinaryArray is multidimensional, the complex code branch is required:
         if array_type.is_rectangular():
-            supports_Array = primitive_type and primitive_type in self._array_format_by_primitive_type
-            if supports_Array:  # if True, a Python Array can be used for the *last* dimension...
-                array_length = lengths.pop()  # ...which is removed from the lengths list here
-            array = multidimensional_array(lengths)  # preallocate a list of lists (it's not a Python Array)
+            if primitive_type and primitive_type in self._array_format_by_primitive_type:
+                array = self._read_rectangular_native_elements(lengths, primitive_type)
+                self._objects_by_id[object_id] = array
+                return array
+            array = multidimensional_array(lengths)  # preallocate a list of lists
             skip  = 0
+            marker_types    = self._marker_types
+            MemberReference = self._MemberReference
             for indexes in itertools.product(*[range(l) for l in lengths]):  # iterates through all of the indexes
-                if supports_Array:
-                    val = self._read_Array_native_elements(array_length, primitive_type)  # read last index in one call
-                else:
-                    if skip > 0:
-                        skip -= 1
-                        continue
-                    val = self._read_Record_or_Primitive(primitive_type)
-                    if isinstance(val, self._BinaryLibrary):  # a BinaryLibrary can precede a non-primitive array element; it's ignored
+                if skip > 0:
+                    skip -= 1
+                    continue
+                val = self._read_Record_or_Primitive(primitive_type)
+                if type(val) in marker_types:  # (see _read_members_into())
+                    if type(val) is self._BinaryLibrary:  # a BinaryLibrary can precede a non-primitive array element; it's ignored
                         val = self._read_Record_or_Primitive(None)
-                    if isinstance(val, self._ObjectNullMultiple):  # represents one or more empty elements
+                    if type(val) is self._ObjectNullMultiple:  # represents one or more empty elements
                         skip = val.count - 1  # counts this iteration which we're skipping right now
                         continue
-                    if isinstance(val, self._MemberReference):     # see _read_MemberReference()
-                        list_indexes = ''.join(f'[{i}]' for i in indexes[:-1])
-                        val.parent          = eval(f'array{list_indexes}')  # the parent list, i.e. all but the last index
-                        val.index_in_parent = indexes[-1]                   # the last index
-                list_indexes = ''.join(f'[{i}]' for i in indexes)
-                exec(f'array{list_indexes} = val')
+                if not indexes:  # if there are no lists (a rank of zero), just a single element
+                    array = val
+                    continue
+                parent = array
+                for i in indexes[:-1]:  # find the parent list, i.e. all but the last index
+                    parent = parent[i]
+                if type(val) is MemberReference:  # see _read_MemberReference()
+                    val.parent          = parent
+                    val.index_in_parent = indexes[-1]   # the last index
+                parent[indexes[-1]] = val
             self._objects_by_id[object_id] = array
             return array
         else:  # else it's not multidimensional, the standard code branch can be used:
             assert len(lengths) == 1
             return self._read_Array_elements(lengths[0], object_id, primitive_type)
 
+    # Reads a multidimensional BinaryArray of a primitive type supported by a Python Array; its
+    # elements are contiguous, so they're all read in one call and then split up into one Python
+    # Array per each of its last dimensions, and those are placed into a preallocated list of lists
+    def _read_rectangular_native_elements(self, lengths, primitive_type):
+        array_length = lengths.pop()  # the last dimension is a Python Array, it's removed here
+        count = array_length
+        for length in lengths:
+            count *= length
+        elements = self._read_Array_native_elements(count, primitive_type)
+        if not lengths:  # if there are no lists, just a single Python Array
+            return elements
+        overwrite_infos = self._overwrite_infos_by_pyid.pop(id(elements)) if self._add_overwrite_info else None
+        array = multidimensional_array(lengths)  # (it's not a Python Array)
+        start = 0
+        for indexes in itertools.product(*[range(l) for l in lengths]):
+            parent = array
+            for i in indexes[:-1]:
+                parent = parent[i]
+            stop = start + array_length
+            val  = parent[indexes[-1]] = elements[start:stop]
+            if overwrite_infos is not None:
+                self._overwrite_infos_by_pyid[id(val)] = overwrite_infos[start:stop]
+            start = stop
+        return array
+
     @_register_reader(_RecordType_readers, 16)
     def _read_ArraySingleObject(self):
         object_id, length = self._read_ArrayInfo()
@@ -430,33 +746,54 @@ class serialization:
     @_register_reader(_RecordType_readers, 15)
     def _read_ArraySinglePrimitive(self):
         object_id, length = self._read_ArrayInfo()
-        primitive_type    = self._file.read(1)
+        primitive_type    = self._read_Byte()
         return self._read_Array_elements(length, object_id, primitive_type)
 
     _read_ArraySingleString = _register_reader(_RecordType_readers, 17)(_read_ArraySingleObject)
 
+    # Arrays of primitive types with an entry in _Array_elements_readers are read all at once
+    # by that reader, all others (including non-primitive arrays) are read one element at a time
     def _read_Array_elements(self, length, object_id, primitive_type = None):
-        if primitive_type and primitive_type in self._array_format_by_primitive_type:
-            array = self._read_Array_native_elements(length, primitive_type)
-            self._objects_by_id[object_id] = array
-            return array
-        return self._read_members_into([None] * length, object_id, lambda i: primitive_type)
+        read_elements = self._Array_elements_readers.get(primitive_type)
+        if read_elements:
+            elements = read_elements(self, length, primitive_type)
+            self._objects_by_id[object_id] = elements
+            return elements
+        return self._read_members_into([None] * length, object_id, [primitive_type] * length)
 
     def _read_Array_native_elements(self, length, primitive_type):
-        if self._add_overwrite_info:
-            initial_pos = self._file.tell()
         array = Array(self._array_format_by_primitive_type[primitive_type])
-        array.fromfile(self._file, length)  # read them in one call
+        initial_pos = self._base_pos + self._pos
+        elements = self._read_raw(length * array.itemsize)
+        if len(elements) != length * array.itemsize:
+            raise EOFError('not enough bytes remaining for array')
+        array.frombytes(elements)  # read them in one call
         if sys.byteorder == 'big' and array.itemsize > 1:
             array.byteswap()
         if self._add_overwrite_info:
-            final_pos = self._file.tell()
-            assert final_pos == length * array.itemsize + initial_pos
+            final_pos = self._base_pos + self._pos
             format = self._struct_format_by_primitive_type[primitive_type]
-            self._overwrite_infos_by_pyid[id(array)] = [ self._OverwriteInfo(pos, format)
-                for pos in range(initial_pos, final_pos, array.itemsize) ]
+            self._overwrite_infos_by_pyid[id(array)] = self._ArrayOverwriteInfos(
+                range(initial_pos, final_pos, array.itemsize), format)
         return array
 
+    # Primitive types which don't fit in a Python Array are still read in one call if they're
+    # a fixed width, and then converted one by one (see _fixed_width_elements_by_primitive_type)
+    def _read_Array_fixed_width_elements(self, length, primitive_type):
+        format, convert = self._fixed_width_elements_by_primitive_type[primitive_type]
+        struct   = Struct('<' + str(length) + format)
+        pos      = self._pos
+        elements = struct.unpack_from(self._buf, pos)
+        self._pos = pos + struct.size
+        elements = list(map(convert, elements) if convert else elements)
+        if self._add_overwrite_info:
+            format = self._struct_format_by_primitive_type.get(primitive_type)
+            if format:
+                initial_pos = self._base_pos + pos
+                self._overwrite_infos_by_pyid[id(elements)] = self._ArrayOverwriteInfos(
+                    range(initial_pos, initial_pos + struct.size, self._struct_size_by_format[format]), format)
+        return elements
+
     # Shouldn't ever be called because it's implemented in _read_Record_or_Primitive()
     # _read_MemberPrimitiveTyped = _register_reader(_RecordType_readers, 8)(_read_ValueWithCode)
     @_register_reader(_RecordType_readers, 8)
@@ -495,12 +832,10 @@ class serialization:
         self._objects_by_id[object_id] = string
         return string
 
+    _SerializationHeaderRecord_size = 17  # including its RecordType
     @_register_reader(_RecordType_readers, 0)
     def _read_SerializationHeaderRecord(self):
-        self._root_id = self._read_Int32()
-        self._read_Int32()  # HeaderId is ignored
-        major_version = self._read_Int32()
-        minor_version = self._read_Int32()
+        self._root_id, header_id, major_version, minor_version = self._read_Int32s(4)  # HeaderId is ignored
         if major_version != 1:
             raise NotImplementedError(f'SerializationHeaderRecord.MajorVersion == {major_version}')
         if minor_version != 0:
@@ -508,17 +843,20 @@ class serialization:
         if self._root_id == 0:
             raise NotImplementedError('SerializationHeaderRecord.RootId == 0')
 
+    # These two records have no state, so each reader returns the same single instance of its class
     class _BinaryLibrary: pass
+    _the_BinaryLibrary = _BinaryLibrary()
     @_register_reader(_RecordType_readers, 12)
     def _read_BinaryLibrary(self):
         self._read_Int32()                 # MinorVersion and
         self._read_LengthPrefixedString()  # LibraryName are ignored
-        return self._BinaryLibrary()
+        return self._the_BinaryLibrary
 
     class _MessageEnd: pass
+    _the_MessageEnd = _MessageEnd()
     @_register_reader(_RecordType_readers, 11)
     def _read_MessageEnd(self):
-        return self._MessageEnd()
+        return self._the_MessageEnd
 
 
     def read_header(self):
@@ -529,8 +867,10 @@ class serialization:
         :return: True if the streamfile is in a supported .NET Remoting Binary Format
         '''
         assert self._root_id is None, 'read_header() has not already been called'
+        if self._rest_unread and not self._buf:  # if nothing has been read yet, read just the header
+            self._buf = self._file.read(self._SerializationHeaderRecord_size)
         try:
-            self._read_Record_or_Primitive(primitive_type=False)
+            self._read_Record_or_Primitive(primitive_type=None)
         except Exception:
             return False
         return self._root_id is not None
@@ -538,126 +878,160 @@ class serialization:
     def read_stream(self):
         '''Read the streamfile in .NET Remoting Binary Format and extract its root object
 
+        If the streamfile is non-seekable, any streams after this one remain only in memory,
+        so they must be read by calling this (or read_streams()) again on the same instance.
+
         :return: the root object contained in the stream
         '''
         if self._root_id is None and not self.read_header():
             raise RuntimeError('SerializationHeaderRecord not found (probably not an NRBF file)')
+        if self._rest_unread:
+            self._read_rest()
         obj = None
-        while not isinstance(obj, self._MessageEnd):
-            obj = self._read_Record_or_Primitive(primitive_type=False)
-        for cls in self._Class_by_id.values():
-            del cls._primitive_types
-        self._Class_by_id.clear()
+        while obj is not self._the_MessageEnd:
+            obj = self._read_Record_or_Primitive(primitive_type=None)
+        self._ClassInfo_by_id.clear()
 
-        # Resolve MemberReferences, ignoring failures (refs to convertible collections can't yet be resolved)
+        # Resolve MemberReferences, deferring failures (refs to convertible collections can't yet be resolved)
+        objects_by_id       = self._objects_by_id
+        deferred_references = []
         for reference in self._member_references:
-            self._resolve_reference(reference, ignore_unresolvable=True)
+            replacement = objects_by_id.get(reference.id)
+            if replacement is not None:
+                reference.parent[reference.index_in_parent] = replacement
+            else:
+                deferred_references.append(reference)
+        self._member_references.clear()
 
         # Convert collections to native Python types, and add them to _objects_by_id so they can be referenced
         # (references to non-collections must already have been resolved as done just above)
         for collection_info in self._collection_infos:
             collection = collection_info.obj
-            converted  = collection.__class__._convert_collection(collection)  # calls one of the converters below
+            converted  = getattr(self, collection.__class__._convert_collection)(collection)  # calls one of the converters below
             self._objects_by_id[collection_info.id] = converted
         self._collection_infos.clear()
 
-        # Resolve all the remaining member references (formerly pointing to collections)
-        for reference in self._member_references:
-            if not reference.resolved:
-                self._resolve_reference(reference)
-        self._member_references.clear()
+        # Resolve all the deferred member references (formerly pointing to collections)
+        for reference in deferred_references:
+            self._resolve_reference(reference)
 
         obj = self._objects_by_id[self._root_id]
         self._objects_by_id.clear()
         self._root_id = None
+
+        # Leave the streamfile positioned just past the end of this stream (as if it had been read incrementally)
+        if self._file and self._pos != len(self._buf) and self._file.seekable():
+            self._file.seek(self._base_pos + self._pos)
         return obj
 
+    def read_streams(self):
+        '''Read every remaining consecutive stream in the streamfile, extracting
+        their root objects one at a time (each only when the next one is requested)
+
+        :return: a generator of the root objects contained in each stream
+        '''
+        while True:
+            yield self.read_stream()
+            if self._pos == len(self._buf):
+                break
+
     # Convert a .NET Collections.Generic.HashSet into a Python set
     @staticmethod
     def _convert_generic_hashset(collection):
-        converted = set()
-        for item in collection.Elements:
-            try:
-                assert item not in converted
-                converted.add(item)
-            except (AssertionError, TypeError):  # not all .NET HashSets can be converted to Python sets;
-                return collection                # if the conversion fails, just proceed w/the original object
+        # Not all .NET HashSets can be converted to Python sets (their elements must be hashable
+        # and unique); if the conversion fails, just proceed w/the original object
+        elements = collection.Elements
+        try:
+            converted = set(elements)
+        except TypeError:
+            return collection
+        if len(converted) != len(elements):  # if there were any duplicate elements
+            return collection
         return converted
 
     # Do the work of _convert_hashtable() and _convert_generic_dictionary()
     # converting a .NET key-value Collection into a Python dict
-    def _do_convertto_dict(self, collection, collection_iter):
-        converted       = {}
-        overwrite_infos = {} if self._add_overwrite_info else None
-        added_overwrite = False
-        for key, value, values_overwrite_info in collection_iter(collection):
-            try:
-                assert key not in converted
-                converted[key] = value
-                if values_overwrite_info:
-                    overwrite_infos[key] = values_overwrite_info
-                    added_overwrite = True
-            except (AssertionError, TypeError):  # not all .NET key-value Collections can be converted to Python dicts;
-                return collection                # if the conversion fails, just proceed w/the original object
-        # If any dict value is a _MemberReference, fix its parent and index_in_parent
-        for key, value in converted.items():
-            if isinstance(value, self._MemberReference):
-                value.parent          = converted
-                value.index_in_parent = key
-        if added_overwrite:
-            self._overwrite_infos_by_pyid[id(converted)] = overwrite_infos
+    def _do_convertto_dict(self, collection, collection_items):
+        # A list of (key, value) tuples, and either None or the values' _OverwriteInfos in the same order
+        items, overwrite_infos = collection_items(collection)
+        # Not all .NET key-value Collections can be converted to Python dicts (their keys must be
+        # hashable and unique); if the conversion fails, just proceed w/the original object
+        try:
+            converted = dict(items)
+        except TypeError:
+            return collection
+        if len(converted) != len(items):  # if there were any duplicate keys
+            return collection
+        # Now that the conversion can't fail, fix the parent and index_in_parent of any
+        # _MemberReference values; usually there are none, which is checked first (stopping
+        # at the first one) to skip the loop below
+        MemberReference = self._MemberReference
+        if MemberReference in map(type, converted.values()):
+            for key, value in converted.items():
+                if type(value) is MemberReference:
+                    value.parent          = converted
+                    value.index_in_parent = key
+        # Collect the _OverwriteInfo of any overwritable values
+        if overwrite_infos:
+            overwrite_infos = {key: values_overwrite_info
+                               for (key, value), values_overwrite_info in zip(items, overwrite_infos)
+                               if values_overwrite_info}
+            if overwrite_infos:
+                self._overwrite_infos_by_pyid[id(converted)] = overwrite_infos
         return converted
 
     # Convert a .NET Collections.HashTable into a Python dict
     def _convert_hashtable(self, collection):
-        return self._do_convertto_dict(collection, self._hashtable_iter)
+        return self._do_convertto_dict(collection, self._hashtable_items)
     #
-    # Iterate over each key, value, and value's _OverwriteInfo in a .NET Collections.HashTable
-    def _hashtable_iter(self, collection):
-        values     = collection.Values
-        len_values = len(values)
+    # Return the keys and values, and the values' _OverwriteInfos, of a .NET Collections.HashTable
+    def _hashtable_items(self, collection):
+        values = collection.Values
         overwrite_infos = self._overwrite_infos_by_pyid.get(id(values)) if self._add_overwrite_info else None
-        for i, key in enumerate(collection.Keys):
-            if i < len_values:
-                yield key, values[i], overwrite_infos[i] if overwrite_infos else None
-            else:
-                yield key, None, None
+        # Any keys past the end of the values have None values (and any values past the keys are ignored)
+        return list(zip(collection.Keys, itertools.chain(values, itertools.repeat(None)))), overwrite_infos
 
     # Convert a .NET Collections.Generic.Dictionary into a Python dict
     def _convert_generic_dictionary(self, collection):
-        return self._do_convertto_dict(collection, self._generic_dictionary_iter)
+        return self._do_convertto_dict(collection, self._generic_dictionary_items)
     #
-    # Iterate over each key, value, and _OverwriteInfo in a .NET Collections.Generic.Dictionary
-    def _generic_dictionary_iter(self, collection):
-        for item in collection.KeyValuePairs:
-            overwrite_infos = self._overwrite_infos_by_pyid.get(id(item)) if self._add_overwrite_info else None
-            yield item.key, item.value, overwrite_infos.value if overwrite_infos else None
+    # Return the keys and values, and the values' _OverwriteInfos, of a .NET Collections.Generic.Dictionary
+    def _generic_dictionary_items(self, collection):
+        key_value_pairs = collection.KeyValuePairs
+        items = [(item.key, item.value) for item in key_value_pairs]
+        if not self._add_overwrite_info:
+            return items, None
+        overwrite_infos_by_pyid = self._overwrite_infos_by_pyid
+        overwrite_infos = []
+        for item in key_value_pairs:
+            items_overwrite_info = overwrite_infos_by_pyid.get(id(item))
+            overwrite_infos.append(items_overwrite_info.value if items_overwrite_info else None)
+        return items, overwrite_infos
 
     # Convert a .NET Collections.ArrayList or .Generic.List into a Python list
     def _do_convertto_list(self, collection):
+        # (always a copy, since the items array can be referenced elsewhere, e.g. by every empty List<T>)
         converted = collection.items[:collection.size]
         if self._add_overwrite_info:
             overwrite_infos = self._overwrite_infos_by_pyid.get(id(collection.items))
             if overwrite_infos:
                 self._overwrite_infos_by_pyid[id(converted)] = overwrite_infos
         # If any list element is a _MemberReference, fix its parent
+        MemberReference = self._MemberReference
         for element in converted:
-            if isinstance(element, self._MemberReference):
+            if type(element) is MemberReference:
                 element.parent = converted  # (the index_in_parent remains the same)
         return converted
     #
     _convert_arraylist    = _do_convertto_list
     _convert_generic_list = _do_convertto_list
 
-    # Replace a _MemberReference with its final referenced object, optionally ignoring
-    # any unresolvable reference (which should point to a not-yet-converted collection)
-    def _resolve_reference(self, reference, ignore_unresolvable = False):
+    # Replace a _MemberReference with its final referenced object
+    def _resolve_reference(self, reference):
         replacement = self._objects_by_id.get(reference.id)
-        if replacement is not None:
-            reference.parent[reference.index_in_parent] = replacement
-            reference.resolved = True
-        elif not ignore_unresolvable:
+        if replacement is None:
             raise RuntimeError(f'Unresolvable MemberReference with ObjectId {reference.id}')
+        reference.parent[reference.index_in_parent] = replacement
 
 
     def overwrite_member(self, obj, member, value):
@@ -674,6 +1048,9 @@ class serialization:
         else:
             overwrite_info = getattr(overwrite_infos, member)
         value   = pack(overwrite_info.format, value)
+        if self._pending_writes is not None:  # if inside of overwrite_batch()
+            self._pending_writes.append((overwrite_info.pos, value))
+            return
         old_pos = self._file.tell()
         try:
             self._file.seek(overwrite_info.pos)
@@ -681,6 +1058,54 @@ class serialization:
         finally:
             self._file.seek(old_pos)
 
+    @contextmanager
+    def overwrite_batch(self):
+        '''A context manager which delays the writes of all overwrite_member() calls made inside of it
+        until it exits, and then writes them in file order, combining any nearby writes into one.
+        If an exception is raised inside of it, the delayed writes are discarded.
+        '''
+        assert self._add_overwrite_info, 'serialization object must have been constructed with can_overwrite_member == True'
+        assert self._pending_writes is None, 'overwrite_batch() has not already been entered'
+        self._pending_writes = []
+        try:
+            yield self
+            writes = self._pending_writes
+        finally:
+            self._pending_writes = None
+        self._write_batch(writes)
+
+    _batch_max_gap = 4096  # writes at most this many bytes apart are combined by _write_batch()
+
+    # Writes a list of (pos, bytes) to the streamfile, combining those close together into one
+    # seek and write (the gaps between them are read and rewritten unchanged); returns nothing
+    def _write_batch(self, writes):
+        runs = []  # (start, end, indexes into writes) for each combined write
+        for i in sorted(range(len(writes)), key=lambda i: writes[i][0]):
+            pos, value = writes[i]
+            if runs and pos <= runs[-1][1] + self._batch_max_gap:
+                start, end, indexes = runs[-1]
+                runs[-1] = start, max(end, pos + len(value)), indexes
+                indexes.append(i)
+            else:
+                runs.append((pos, pos + len(value), [i]))
+        if not runs:
+            return
+        old_pos = self._file.tell()
+        try:
+            for start, end, indexes in runs:
+                if len(indexes) == 1:
+                    chunk = writes[indexes[0]][1]
+                else:
+                    self._file.seek(start)
+                    chunk = bytearray(self._file.read(end - start))
+                    for i in sorted(indexes):  # in their original order, so later writes to the same pos win
+                        pos, value = writes[i]
+                        chunk[pos - start : pos - start + len(value)] = value
+                self._file.seek(start)
+                self._file.write(chunk)
+        finally:
+            self._file.seek(old_pos)
+
     def is_member_writable(self, obj, member):
         '''Returns True if the object's member can be overwritten.
         Can (but isn't guaranteed to) raise an exception if the member doesn't exist.
@@ -699,57 +1124,106 @@ class serialization:
         return getattr(overwrite_infos, member) is not None
 
 
+# The class of a serialization created with can_overwrite_member=False, see serialization.__new__()
+class _read_only_serialization(serialization):
+    _read_Record_or_Primitive = serialization._read_Record_or_Primitive_fast
+
+
 # Finish setting up the serialization class
 serialization._create_PrimitiveType_readers()
 #
 serialization._AdditionalInfo_readers = (
-    lambda self: self._file.read(1),           # 0 Primitive
+    serialization._read_Byte,                  # 0 Primitive
     serialization._read_Null,                  # 1 String
     serialization._read_Null,                  # 2 Object
     serialization._read_LengthPrefixedString,  # 3 SystemClass
     serialization._read_ClassTypeInfo,         # 4 Class
     serialization._read_Null,                  # 5 ObjectArray
     serialization._read_Null,                  # 6 StringArray
-    lambda self: self._file.read(1),           # 7 PrimitiveArray
+    serialization._read_Byte,                  # 7 PrimitiveArray
 )
+#
+# The types returned by RecordType readers which aren't values, but which
+# instead must be handled specially wherever members or elements are read
+serialization._marker_types = frozenset((
+    serialization._BinaryLibrary,
+    serialization._ObjectNullMultiple,
+    serialization._MemberReference,
+))
+#
+# struct-format-specs (w/o a byte order) and conversions for _read_Array_fixed_width_elements()
+serialization._fixed_width_elements_by_primitive_type = {
+     1: ('?', None),                                # Boolean
+    12: ('q', serialization._timedelta_from_ticks),  # TimeSpan
+    13: ('Q', serialization._datetime_from_ticks),   # DateTime
+}
+serialization._Array_elements_readers.update(dict.fromkeys(
+    serialization._fixed_width_elements_by_primitive_type, serialization._read_Array_fixed_width_elements))
 
 # Now that we're done adding PrimitiveType and RecordType readers, ensure they're
 # all present (except PrimitiveType 4 and RecordTypes 18-20 which aren't defined)
-assert all(bytes([i]) in serialization._PrimitiveType_readers for i in range(1, 19) if i != 4)
-assert all(bytes([i]) in serialization._RecordType_readers    for i in range(23)    if not 18 <= i <= 20)
+assert all(serialization._PrimitiveType_readers[i] is not serialization._read_unknown_PrimitiveType
+           for i in range(1, 19) if i != 4)
+assert all(serialization._RecordType_readers[i] is not serialization._read_unknown_RecordType
+           for i in range(23) if not 18 <= i <= 20)
 
 
 def read_stream(streamfile):
     '''Read a file in .NET Remoting Binary Format and extract its root object
 
-    :param streamfile: a file-like object
+    The rest of a file-like streamfile is read into memory; if it's seekable, it's left positioned
+    just past the end of the stream, however a non-seekable streamfile (e.g. a pipe) is consumed
+    entirely, discarding any streams after the first one (use read_streams() to read them all).
+
+    :param streamfile: a file-like object, or a bytes, bytearray, or mmap object
     :return: the root object contained in the stream
     '''
     return serialization(streamfile).read_stream()
 
+def read_streams(streamfile):
+    '''Read a file of one or more consecutive streams in .NET Remoting Binary Format
+    and extract their root objects one at a time (each only when the next one is requested)
+
+    :param streamfile: a file-like object, or a bytes, bytearray, or mmap object
+    :return: a generator of the root objects contained in each stream
+    '''
+    return serialization(streamfile).read_streams()
+
 # A JSONEncoder which can convert an object returned by read_stream() into json
 # (can't handle circular references; primarily intended for debugging purposes)
 class JSONEncoder(json.JSONEncoder):
+    # Converters indexed by type; an object's type (or else its nearest base type) is looked up here
+    _converters_by_type = {
+        Array:     Array.tolist,
+        set:       list,
+        datetime:  str,
+        timedelta: str,
+        Decimal:   repr,
+    }
+
     def default(self, o):
-        if hasattr(o, '_asdict'):
+        if hasattr(o, '_asdict'):  # (checked first, since namedlists are by far the most common)
             d = OrderedDict(_class_name=o.__class__.__name__)  # prepend the class name
             d.update(o._asdict())
             return d
-        if isinstance(o, Array):
-            return o.tolist()
-        if isinstance(o, set):
-            return list(o)
-        if isinstance(o, (datetime, timedelta)):
-            return str(o)
-        if isinstance(o, Decimal):
-            return repr(o)
+        for cls in type(o).__mro__:  # (the exact type is usually found on the first try)
+            convert = self._converters_by_type.get(cls)
+            if convert:
+                return convert(o)
         return super().default(o)
 
 
-# Returns a version of the identifier suitable to pass to namedlist
-_identifier_re = re.compile('[^a-z0-9_]', flags=re.IGNORECASE)
+# Returns a version of the identifier suitable to pass to namedlist; ASCII identifiers (nearly all of
+# them) are sanitized with bytes.translate(), which is faster than the regex required for the others
+_identifier_re    = re.compile('[^a-z0-9_]', flags=re.IGNORECASE)
+_identifier_bytes = b'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_'
+_identifier_table = bytes(c if c in _identifier_bytes else ord('_') for c in range(256))
 def sanitize_identifier(identifier):
-    identifier = _identifier_re.sub('_', identifier).lstrip('0123456789_')
+    try:
+        identifier = identifier.encode('ascii').translate(_identifier_table).decode('ascii')
+    except UnicodeEncodeError:
+        identifier = _identifier_re.sub('_', identifier)
+    identifier = identifier.lstrip('0123456789_')
     if not identifier:
         return 'invalid_identifier'
     if iskeyword(identifier):
@@ -757,31 +1231,34 @@ def sanitize_identifier(identifier):
     assert identifier.isidentifier()
     return identifier
 
-# Returns a version of the name which isn't present in the unique_set
-def make_unique(name, unique_set):
+# Returns a version of the name which isn't present in the unique_set; if the same next_suffixes
+# dict is passed in each time (while unique_set only grows), suffixes already tried aren't retried
+def make_unique(name, unique_set, next_suffixes = None):
     if name not in unique_set:
         return name
-    for append in itertools.count(2):
-        replacement = name + str(append)
+    append = next_suffixes.get(name, 2) if next_suffixes is not None else 2
+    while True:
+        replacement = f'{name}{append}'
         if replacement not in unique_set:
+            if next_suffixes is not None:
+                next_suffixes[name] = append
             return replacement
+        append += 1
 
 # Pre-allocates a "multidimensional array", i.e. a list of lists of Nones
 def multidimensional_array(lengths):
     if not lengths:
         return None
-    arrays = [None] * lengths[-1]
-    for length in reversed(lengths[:-1]):
-        arrays = [deepcopy(arrays) for i in range(length)]
-    return arrays
+    if len(lengths) == 1:
+        return [None] * lengths[0]
+    inner_lengths = lengths[1:]
+    return [multidimensional_array(inner_lengths) for i in range(lengths[0])]
 
 
 if __name__ == '__main__':
     if len(sys.argv) != 2:
         sys.exit(f'Usage: {sys.argv[0]} streamfile')
     with open(sys.argv[1], 'rb') as streamfile:
-        while True:
-            json.dump(read_stream(streamfile), sys.stdout, cls=JSONEncoder, indent=4)
+        for obj in read_streams(streamfile):
+            json.dump(obj, sys.stdout, cls=JSONEncoder, indent=4)
             print()
-            if streamfile.peek(1) == b'':
-                break